@@ -6,24 +6,59 @@ Library Book Inventory Manager (CLI)
 - Book: id (unique), title, author, total_copies, issued_count
 - Library handles lookup using dicts for fast access
 """
+import bisect
+import heapq
 import json
+import mmap
 import os
-from dataclasses import dataclass, asdict
-from typing import Dict, Optional, List
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import DefaultDict, Dict, Optional, List, Set
+
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to stdlib json
+    orjson = None
 
 DATA_FILE = "library.json"
+LOG_SUFFIX = ".log"  # append-only change log kept next to the data file
+NGRAM = 3  # search index gram size; shorter keywords fall back to a scan
+# Building the trigram index costs roughly 150 linear scans, so searches scan
+# until they have done that much work and only then build it
+INDEX_AFTER_SCANS = 150
+MAX_COUNT = 2 ** 63 - 1  # orjson only encodes 64-bit ints, so copy counts stay within that
 
 
-@dataclass
+@dataclass(slots=True)
 class Book:
     book_id: str
     title: str
     author: str
     total_copies: int
     issued_count: int = 0
+    # casefolded copies used by Library.search, computed once per book
+    _title_cf: str = field(init=False, repr=False, compare=False)
+    _author_cf: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._title_cf = self.title.casefold()
+        self._author_cf = self.author.casefold()
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "book_id": self.book_id,
+            "title": self.title,
+            "author": self.author,
+            "total_copies": self.total_copies,
+            "issued_count": self.issued_count
+        }
+
+    def to_json(self) -> bytes:
+        # Same fields as to_dict(), encoded directly without building the dict
+        return b'{"book_id": %s, "title": %s, "author": %s, "total_copies": %d, "issued_count": %d}' % (
+            _json_str(self.book_id), _json_str(self.title), _json_str(self.author),
+            self.total_copies, self.issued_count)
 
     @staticmethod
     def from_dict(d):
@@ -40,67 +75,238 @@ class Book:
         return self.total_copies - self.issued_count
 
 
+def _json_str(s: str) -> bytes:
+    return orjson.dumps(s) if orjson else json.dumps(s).encode("utf-8")
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
 class Library:
     def __init__(self, data_file: str = DATA_FILE):
         self.data_file = data_file
-        self.books: Dict[str, Book] = {}  # keyed by book_id
-        self.load()
+        self.log_file = os.path.splitext(data_file)[0] + LOG_SUFFIX
+        self._books: Dict[str, Book] = {}  # keyed by book_id, which callers pass already stripped
+        # gram -> book_ids; None until the first search that needs it
+        self._trigram_index: Optional[DefaultDict[str, Set[str]]] = None
+        self._scanned = 0  # books checked by linear searches while no index exists
+        # Columnar copies of the counters for report(); row i belongs to _ids[i].
+        # Plain lists so any int the CLI accepts fits, not just 64-bit values
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._total: List[int] = []
+        self._issued: List[int] = []
+        self._sorted_ids: List[str] = []  # book_ids in list_books() order
+        self._dirty = False  # changes not yet in the snapshot
+        self._loaded = False  # catalog is parsed on first use, see _ensure_loaded
+        self._log = None  # opened on the first logged change
+
+    @property
+    def books(self) -> Dict[str, Book]:
+        self._ensure_loaded()
+        return self._books
 
     def load(self):
         if os.path.exists(self.data_file):
             try:
-                with open(self.data_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                # Map the file so orjson parses the page cache without a copy
+                with open(self.data_file, "rb") as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if orjson:
+                        with memoryview(mm) as view:
+                            data = orjson.loads(view)
+                    else:
+                        data = json.loads(mm[:])
                 for bid, bdict in data.items():
-                    self.books[bid] = Book.from_dict(bdict)
-            except (json.JSONDecodeError, IOError) as e:
+                    self._books[bid] = Book.from_dict(bdict)
+            except (ValueError, IOError) as e:  # bad JSON or an empty (unmappable) file
                 print(f"Warning: failed to read data file ({e}). Starting empty library.")
-                self.books = {}
+                self._books = {}
         else:
-            self.books = {}
+            self._books = {}
+        self._replay_log()
+        self._trigram_index = None
+        self._scanned = 0
+        self._ids, self._row = [], {}
+        self._total, self._issued = [], []
+        for bid, b in self._books.items():
+            self._index_book(bid, b)
+        self._sorted_ids = sorted(self._books)
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _index_book(self, bid: str, book: Book):
+        if self._trigram_index is not None:
+            self._add_grams(bid, book)
+        self._row[bid] = len(self._ids)
+        self._ids.append(bid)
+        self._total.append(book.total_copies)
+        self._issued.append(book.issued_count)
+
+    def _add_grams(self, bid: str, book: Book):
+        for gram in _trigrams(book._title_cf) | _trigrams(book._author_cf):
+            self._trigram_index[gram].add(bid)
 
-    def save(self):
+    def _ensure_trigram_index(self):
+        if self._trigram_index is None:
+            self._trigram_index = defaultdict(set)
+            for bid, b in self._books.items():
+                self._add_grams(bid, b)
+
+    def _set_counts(self, bid: str, total: int, issued: int):
+        # Called before the Book is changed, so a failure leaves both untouched
+        i = self._row[bid]
+        self._total[i] = total
+        self._issued[i] = issued
+
+    def _replay_log(self):
+        # Records carry the full book state, so replaying one twice is harmless
+        if not os.path.exists(self.log_file):
+            return
+        good_end = 0  # byte offset just past the last complete record
+        with open(self.log_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn last record from a crash
+                try:
+                    record = orjson.loads(line) if orjson else json.loads(line)
+                except ValueError:
+                    break
+                book = Book.from_dict(record["book"])
+                self._books[book.book_id] = book
+                self._dirty = True
+                good_end += len(line)
+        # Drop the torn tail so new records don't get glued onto it
+        if good_end < os.path.getsize(self.log_file):
+            with open(self.log_file, "r+b") as f:
+                f.truncate(good_end)
+
+    def _log_op(self, op: str, book: Book):
+        record = {"op": op, "book": book.to_dict()}
+        line = orjson.dumps(record) if orjson else json.dumps(record).encode("utf-8")
+        if self._log is None:
+            # Unbuffered so every record reaches the OS in one write
+            self._log = open(self.log_file, "ab", buffering=0)
+        self._log.write(line + b"\n")
+        self._dirty = True
+
+    def save(self, durable: bool = False):
+        """
+        Write the catalog to disk.
+        With durable=False the data may still sit in the OS page cache and can
+        be lost on a power failure/crash; durable=True fsyncs the file and, after
+        the rename, its directory before returning.
+        The file is written to a temp path and renamed over the old one, so a
+        crash mid-write never leaves a truncated library.json behind.
+        """
+        self._ensure_loaded()  # never overwrite the file with an unloaded, empty catalog
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump({bid: b.to_dict() for bid, b in self.books.items()}, f, indent=2)
+            # One book per line, appended into a single buffer
+            data = bytearray(b"{")
+            for i, (bid, b) in enumerate(self._books.items()):
+                data += b",\n  " if i else b"\n  "
+                data += _json_str(bid)
+                data += b": "
+                data += b.to_json()
+            data += b"\n}\n" if self._books else b"}\n"
+            # Serialize up front and hand the file a single write
+            tmp = self.data_file + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                    if durable:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp, self.data_file)
+            except IOError:
+                # Don't leave a half-written temp file behind
+                try:
+                    os.unlink(tmp)
+                except IOError:
+                    pass
+                raise
+            if durable and os.name == "posix":
+                # The rename itself is only durable once the directory entry is synced
+                dir_fd = os.open(os.path.dirname(os.path.abspath(self.data_file)) or ".", os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            return True
         except IOError as e:
             print(f"Error saving library: {e}")
+            return False
+
+    def compact(self, durable: bool = False):
+        # Fold the change log into a fresh snapshot, then start the log over
+        if self._dirty and self.save(durable=durable):
+            if os.path.exists(self.log_file):
+                os.truncate(self.log_file, 0)
+            self._dirty = False
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
 
     def add_book(self, book: Book) -> bool:
-        bid = book.book_id.strip()
+        self._ensure_loaded()  # needed for the duplicate-ID check
+        bid = book.book_id
         if not bid:
             print("Error: Book ID cannot be empty.")
             return False
-        if bid in self.books:
+        if bid in self._books:
             print(f"Error: Book ID '{bid}' exists. Use update to change copies.")
             return False
-        self.books[bid] = book
-        self.save()
+        self._index_book(bid, book)
+        self._books[bid] = book
+        bisect.insort(self._sorted_ids, bid)
+        self._log_op("add", book)
         return True
 
     def update_book_copies(self, book_id: str, new_total: int) -> bool:
-        bid = book_id.strip()
-        if bid not in self.books:
-            print(f"Error: Book ID '{bid}' not found.")
+        self._ensure_loaded()
+        if book_id not in self._books:
+            print(f"Error: Book ID '{book_id}' not found.")
             return False
-        book = self.books[bid]
+        book = self._books[book_id]
         if new_total < book.issued_count:
             print("Error: new total copies cannot be less than currently issued copies.")
             return False
+        self._set_counts(book_id, new_total, book.issued_count)
         book.total_copies = new_total
-        self.save()
+        self._log_op("update", book)
         return True
 
     def find_by_id(self, book_id: str) -> Optional[Book]:
-        return self.books.get(book_id.strip())
+        self._ensure_loaded()
+        return self._books.get(book_id)
 
     def search(self, keyword: str) -> List[Book]:
-        kw = keyword.lower().strip()
-        results = []
-        for b in self.books.values():
-            if kw in b.title.lower() or kw in b.author.lower():
-                results.append(b)
-        return results
+        self._ensure_loaded()
+        kw = keyword.casefold().strip()
+        if not kw:
+            return []
+        if len(kw) < NGRAM:
+            candidates = self._books.keys()
+        elif self._trigram_index is None and self._scanned < INDEX_AFTER_SCANS * len(self._books):
+            candidates = self._books.keys()
+            self._scanned += len(self._books)
+        else:
+            # Only books containing every gram of the keyword can match
+            self._ensure_trigram_index()
+            postings = sorted((self._trigram_index.get(g, set()) for g in _trigrams(kw)), key=len)
+            candidates = set.intersection(*postings)
+        matches = []
+        for bid in candidates:
+            b = self._books[bid]
+            if kw in b._title_cf or kw in b._author_cf:
+                matches.append(bid)
+        return [self._books[bid] for bid in sorted(matches)]
 
     def issue_book(self, book_id: str) -> bool:
         b = self.find_by_id(book_id)
@@ -110,8 +316,9 @@ class Library:
         if b.available <= 0:
             print("No copies available to issue.")
             return False
+        self._set_counts(book_id, b.total_copies, b.issued_count + 1)
         b.issued_count += 1
-        self.save()
+        self._log_op("issue", b)
         return True
 
     def return_book(self, book_id: str) -> bool:
@@ -122,23 +329,27 @@ class Library:
         if b.issued_count <= 0:
             print("No issued copies to return.")
             return False
+        self._set_counts(book_id, b.total_copies, b.issued_count - 1)
         b.issued_count -= 1
-        self.save()
+        self._log_op("return", b)
         return True
 
     def list_books(self):
-        if not self.books:
+        self._ensure_loaded()
+        if not self._books:
             print("Library is empty.")
             return
         rows = []
-        for bid, b in sorted(self.books.items(), key=lambda x: x[0]):
+        for bid in self._sorted_ids:
+            b = self._books[bid]
             rows.append((b.book_id, b.title, b.author, str(b.total_copies), str(b.issued_count), str(b.available)))
         print_table(["ID", "Title", "Author", "Total", "Issued", "Available"], rows)
 
     def report(self):
-        total_books = sum(b.total_copies for b in self.books.values())
-        total_issued = sum(b.issued_count for b in self.books.values())
-        unique_titles = len(self.books)
+        self._ensure_loaded()
+        total_books = sum(self._total)
+        total_issued = sum(self._issued)
+        unique_titles = len(self._books)
         print("Library Report")
         print("--------------")
         print(f"Unique titles : {unique_titles}")
@@ -146,7 +357,8 @@ class Library:
         print(f"Issued copies : {total_issued}")
         print(f"Available now : {total_books - total_issued}")
         # Top 5 most issued
-        top = sorted(self.books.values(), key=lambda x: x.issued_count, reverse=True)[:5]
+        top_rows = heapq.nlargest(5, range(len(self._ids)), key=self._issued.__getitem__)
+        top = [self._books[self._ids[i]] for i in top_rows]
         if top:
             print("\nTop issued books:")
             for b in top:
@@ -154,18 +366,18 @@ class Library:
 
 
 def print_table(headers, rows):
-    cols = len(headers)
-    widths = [len(str(h)) for h in headers]
-    for row in rows:
-        for i, cell in enumerate(row):
-            widths[i] = max(widths[i], len(str(cell)))
+    # rows hold pre-formatted str cells, so widths come straight from len()
+    widths = [len(h) for h in headers]
+    for i, col in enumerate(zip(*rows)):
+        widths[i] = max(widths[i], max(map(len, col)))
     sep = " | "
-    header_line = sep.join(str(h).ljust(widths[i]) for i, h in enumerate(headers))
-    divider = "-+-".join("-" * widths[i] for i in range(cols))
-    print(header_line)
-    print(divider)
-    for row in rows:
-        print(sep.join(str(cell).ljust(widths[i]) for i, cell in enumerate(row)))
+    lines = [
+        sep.join(h.ljust(w) for h, w in zip(headers, widths)),
+        "-+-".join("-" * w for w in widths),
+    ]
+    lines.extend(sep.join(cell.ljust(w) for cell, w in zip(row, widths)) for row in rows)
+    # One write for the whole table rather than a print() per row
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def prompt_int(prompt_text: str, default: Optional[int] = None) -> int:
@@ -175,13 +387,16 @@ def prompt_int(prompt_text: str, default: Optional[int] = None) -> int:
             return default
         try:
             n = int(v)
-            return n
         except ValueError:
             print("Please enter a valid integer.")
+            continue
+        if abs(n) > MAX_COUNT:
+            print(f"Please enter a number no larger than {MAX_COUNT}.")
+            continue
+        return n
 
 
-def main_menu():
-    print("""
+MENU_TEXT = """
 Library Book Inventory Manager
 ------------------------------
 1. Add book
@@ -192,72 +407,109 @@ Library Book Inventory Manager
 6. List all books
 7. Report
 8. Exit
-""")
+"""
+
+
+def main_menu():
+    print(MENU_TEXT)
+
+
+def _cmd_add(lib: Library):
+    print("\nAdd Book")
+    bid = input("Book ID (unique): ").strip()
+    title = input("Title: ").strip()
+    author = input("Author: ").strip()
+    total = prompt_int("Total copies: ", default=1)
+    if not bid or not title:
+        print("Book ID and Title required.")
+        return
+    book = Book(book_id=bid, title=title, author=author, total_copies=total)
+    if lib.add_book(book):
+        print("Book added.\n")
+
+
+def _cmd_update(lib: Library):
+    print("\nUpdate Book Copies")
+    bid = input("Book ID: ").strip()
+    if not bid:
+        print("Book ID required.")
+        return
+    book = lib.find_by_id(bid)
+    if not book:
+        print("Book not found.")
+        return
+    print(f"Current total copies: {book.total_copies}, issued: {book.issued_count}")
+    new_total = prompt_int("New total copies: ")
+    if lib.update_book_copies(bid, new_total):
+        print("Updated.\n")
+
+
+def _cmd_search(lib: Library):
+    kw = input("Search keyword (title/author): ").strip()
+    if not kw:
+        print("Enter search keyword.")
+        return
+    results = lib.search(kw)
+    if not results:
+        print("No results.\n")
+    else:
+        rows = [(b.book_id, b.title, b.author, str(b.total_copies), str(b.issued_count), str(b.available)) for b in results]
+        print_table(["ID", "Title", "Author", "Total", "Issued", "Available"], rows)
+        print()
+
+
+def _cmd_issue(lib: Library):
+    bid = input("Book ID to issue: ").strip()
+    if lib.issue_book(bid):
+        print("Book issued.\n")
+
+
+def _cmd_return(lib: Library):
+    bid = input("Book ID to return: ").strip()
+    if lib.return_book(bid):
+        print("Book returned.\n")
+
+
+def _cmd_list(lib: Library):
+    print("\nAll Books")
+    lib.list_books()
+    print()
+
+
+def _cmd_report(lib: Library):
+    lib.report()
+    print()
+
+
+HANDLERS = {
+    "1": _cmd_add,
+    "2": _cmd_update,
+    "3": _cmd_search,
+    "4": _cmd_issue,
+    "5": _cmd_return,
+    "6": _cmd_list,
+    "7": _cmd_report,
+}
+EXIT_CHOICE = "8"
 
 
 def main():
     lib = Library()
-    while True:
-        main_menu()
-        choice = input("Choose (1-8): ").strip()
-        if choice == "1":
-            print("\nAdd Book")
-            bid = input("Book ID (unique): ").strip()
-            title = input("Title: ").strip()
-            author = input("Author: ").strip()
-            total = prompt_int("Total copies: ", default=1)
-            if not bid or not title:
-                print("Book ID and Title required.")
-                continue
-            book = Book(book_id=bid, title=title, author=author, total_copies=total)
-            if lib.add_book(book):
-                print("Book added.\n")
-        elif choice == "2":
-            print("\nUpdate Book Copies")
-            bid = input("Book ID: ").strip()
-            if not bid:
-                print("Book ID required.")
-                continue
-            book = lib.find_by_id(bid)
-            if not book:
-                print("Book not found.")
-                continue
-            print(f"Current total copies: {book.total_copies}, issued: {book.issued_count}")
-            new_total = prompt_int("New total copies: ")
-            if lib.update_book_copies(bid, new_total):
-                print("Updated.\n")
-        elif choice == "3":
-            kw = input("Search keyword (title/author): ").strip()
-            if not kw:
-                print("Enter search keyword.")
-                continue
-            results = lib.search(kw)
-            if not results:
-                print("No results.\n")
+    try:
+        while True:
+            main_menu()
+            choice = input("Choose (1-8): ").strip()
+            if choice == EXIT_CHOICE:
+                print("Exiting.")
+                break
+            handler = HANDLERS.get(choice)
+            if handler:
+                handler(lib)
             else:
-                rows = [(b.book_id, b.title, b.author, str(b.total_copies), str(b.issued_count), str(b.available)) for b in results]
-                print_table(["ID", "Title", "Author", "Total", "Issued", "Available"], rows)
-                print()
-        elif choice == "4":
-            bid = input("Book ID to issue: ").strip()
-            if lib.issue_book(bid):
-                print("Book issued.\n")
-        elif choice == "5":
-            bid = input("Book ID to return: ").strip()
-            if lib.return_book(bid):
-                print("Book returned.\n")
-        elif choice == "6":
-            print("\nAll Books")
-            lib.list_books()
-            print()
-        elif choice == "7":
-            lib.report()
-            print()
-        elif choice == "8":
-            print("Exiting.")
-            break
-        else:
-            print("Invalid option.\n")
+                print("Invalid option.\n")
+    finally:
+        lib.compact(durable=True)
+        lib.close()
 
 
 if __name__ == "__main__":